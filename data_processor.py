@@ -1,125 +1,409 @@
+import collections
+import functools
 import numpy as np
-import csv
 from PyQt5.QtCore import QObject, pyqtSignal
-from PyQt5.QtWidgets import QMessageBox, QFileDialog
-import pyqtgraph as pg
-import pyqtgraph.exporters
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+_CSV_CHUNK_ROWS = 1 << 20
+_SMALL_BATCH = 8
+
+# Immutable, so it can be shared with signal receivers without copying
+Metrics = collections.namedtuple(
+    'Metrics',
+    'peak_value centroid max_intensity fwhm snr auc',
+    defaults=(0, 0, 0, 0, 0, 0)
+)
+
+
+def _interpolate_crossing(x, y, i, j, level):
+    """Linearly interpolate the x position where y crosses level between bins i and j"""
+    return x[i] + (level - y[i]) / (y[j] - y[i]) * (x[j] - x[i])
+
+
+def _state_kernel(x, y):
+    """Recompute the running metric state over x and y in one fused loop.
+    
+    Returns (peak_idx, dip_idx, sum_y, sum_xy, auc, noise_n, noise_mean, noise_M2).
+    """
+    n = len(y)
+    peak_idx = 0
+    dip_idx = 0
+    sum_y = 0.0
+    sum_xy = 0.0
+    auc = 0.0
+    for i in range(n):
+        yi = y[i]
+        sum_y += yi
+        sum_xy += x[i] * yi
+        if i > 0:
+            auc += 0.5 * (yi + y[i - 1]) * (x[i] - x[i - 1])
+        if yi > y[peak_idx]:
+            peak_idx = i
+        if yi < y[dip_idx]:
+            dip_idx = i
+    
+    # The noise threshold depends on the final maximum, so it needs a second loop
+    threshold = y[peak_idx] * 0.1
+    noise_n = 0
+    noise_mean = 0.0
+    noise_M2 = 0.0
+    for i in range(n):
+        yi = y[i]
+        if yi < threshold:
+            noise_n += 1
+            delta = yi - noise_mean
+            noise_mean += delta / noise_n
+            noise_M2 += delta * (yi - noise_mean)
+    return peak_idx, dip_idx, sum_y, sum_xy, auc, noise_n, noise_mean, noise_M2
+
+
+def _state_numpy(x, y):
+    """NumPy equivalent of _state_kernel, used when Numba is not installed"""
+    peak_idx = int(y.argmax())
+    noise = y[y < y[peak_idx] * 0.1]
+    noise_mean = float(noise.mean()) if len(noise) else 0.0
+    return (peak_idx, int(y.argmin()), float(y.sum()), float(np.dot(x, y)),
+            float(np.trapezoid(y, x)), len(noise), noise_mean,
+            float(((noise - noise_mean) ** 2).sum()))
+
+
+if njit is not None:
+    _recompute_state = njit(cache=True, fastmath=True)(_state_kernel)
+else:
+    _recompute_state = _state_numpy
+
+
+@functools.lru_cache(maxsize=32)
+def _format_metrics(peak_value, centroid, max_intensity, fwhm, snr, auc):
+    """Format metrics already rounded to display precision, cached for repeated values"""
+    return {
+        'peak_value': f"Peak Value is {peak_value:.2f} nm",
+        'centroid': f"Centroid is {centroid:.2f} nm",
+        'max_intensity': f"Maximum Intensity is {max_intensity:.0f}",
+        'fwhm': f"FWHM is {fwhm:.2f} nm",
+        'snr': f"SNR is {snr:.1f}",
+        'auc': f"AUC is {auc:.0f}"
+    }
 
 
 class DataProcessor(QObject):
     """Handles data processing, metrics calculation, and export functionality"""
     
     # Signals for communication with main application
-    metrics_updated = pyqtSignal(dict)  # Updated metrics dictionary
+    metrics_updated = pyqtSignal(object)  # Updated Metrics tuple
     
-    def __init__(self):
+    def __init__(self, emission=True):
         super().__init__()
-        self.data_points = []
-        self.metrics = {
-            'peak_value': 0,
-            'centroid': 0,
-            'max_intensity': 0,
-            'fwhm': 0,
-            'snr': 0,
-            'auc': 0
-        }
+        # Emission spectra have a peak, absorption spectra a dip
+        self.emission = emission
+        self._exporter_cache = {}
+        # Column buffers holding the data points, grown geometrically
+        self._cap = 1024
+        self._n = 0
+        self._x = np.empty(self._cap)
+        self._y = np.empty(self._cap)
+        self._reset_running_state()
+        self.metrics = Metrics()
     
     def add_data_point(self, x, y):
         """Add a new data point to the dataset"""
-        self.data_points.append((x, y))
+        self._append_point(x, y)
         self.calculate_metrics()
-        self.metrics_updated.emit(self.metrics.copy())
+        self.metrics_updated.emit(self.metrics)
+    
+    def add_data_point_fast(self, x, y):
+        """Add a new data point without recalculating metrics or emitting signals.
+        
+        Callers are expected to call calculate_metrics() before reading metrics.
+        """
+        self._append_point(x, y)
+    
+    def add_data_points_batch(self, xs, ys):
+        """Add a chunk of data points without recalculating metrics or emitting signals.
+        
+        Running sums are updated with one vectorized pass over the chunk.
+        Callers are expected to call calculate_metrics() before reading metrics.
+        """
+        k = len(xs)
+        if k <= _SMALL_BATCH:
+            # NumPy's per-call overhead outweighs the work for a handful of points
+            for x, y in zip(np.asarray(xs).tolist(), np.asarray(ys).tolist()):
+                self._append_point(x, y)
+            return
+        
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        
+        start = self._n
+        self._reserve(start + k)
+        self._x[start:start + k] = xs
+        self._y[start:start + k] = ys
+        self._n += k
+        
+        self._sum_y += float(ys.sum())
+        self._sum_xy += float(np.dot(xs, ys))
+        
+        # Edge joining the chunk to the previous point, then the chunk's own edges
+        if self._prev_x is not None:
+            self._auc += 0.5 * (ys[0] + self._prev_y) * (xs[0] - self._prev_x)
+        self._auc += float(np.trapezoid(ys, xs))
+        self._prev_x = float(xs[-1])
+        self._prev_y = float(ys[-1])
+        
+        # One vectorized reduction per chunk instead of per-sample comparisons
+        i = int(ys.argmax())
+        if ys[i] > self._max_y:
+            self._max_y = float(ys[i])
+            self._peak_x = float(xs[i])
+            self._peak_idx = start + i
+        i = int(ys.argmin())
+        if ys[i] < self._min_y:
+            self._min_y = float(ys[i])
+            self._dip_idx = start + i
+        
+        # Merge the chunk's noise statistics into the running ones (Chan et al.)
+        if self._max_y > self._noise_ref_max * 1.1:
+            self._noise_stale = True
+        elif not self._noise_stale:
+            noise = ys[ys < self._max_y * 0.1]
+            if len(noise):
+                n_a = self._noise_n
+                n_b = len(noise)
+                mean_b = float(noise.mean())
+                delta = mean_b - self._noise_mean
+                self._noise_n = n_a + n_b
+                self._noise_mean += delta * n_b / self._noise_n
+                self._noise_M2 += (float(((noise - mean_b) ** 2).sum())
+                                   + delta ** 2 * n_a * n_b / self._noise_n)
+    
+    def load_data(self, xs, ys):
+        """Replace all data points, e.g. with a previously saved scan.
+        
+        The running metric state is rebuilt in one pass by the next
+        calculate_metrics() call.
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        self._reset_running_state()
+        self._reserve(len(xs))
+        self._x[:len(xs)] = xs
+        self._y[:len(ys)] = ys
+        self._n = len(xs)
+        self._state_valid = False
+    
+    def _rebuild_running_state(self):
+        """Recompute the incremental metric state from the buffers"""
+        x = self._x[:self._n]
+        y = self._y[:self._n]
+        (peak_idx, dip_idx, self._sum_y, self._sum_xy, self._auc,
+         self._noise_n, self._noise_mean, self._noise_M2) = _recompute_state(x, y)
+        self._peak_idx = int(peak_idx)
+        self._dip_idx = int(dip_idx)
+        self._max_y = float(y[peak_idx])
+        self._peak_x = float(x[peak_idx])
+        self._min_y = float(y[dip_idx])
+        self._prev_x = float(x[-1])
+        self._prev_y = float(y[-1])
+        self._noise_ref_max = self._max_y
+        self._noise_stale = False
+        self._state_valid = True
+        self._points_cache = None
+    
+    def _reserve(self, size):
+        """Grow the column buffers geometrically until they hold size points"""
+        if size <= self._cap:
+            return
+        while self._cap < size:
+            self._cap *= 2
+        self._x = np.resize(self._x, self._cap)
+        self._y = np.resize(self._y, self._cap)
+    
+    def _append_point(self, x, y):
+        """Store a point in the column buffers and update running sums in O(1)"""
+        x = float(x)
+        y = float(y)
+        self._reserve(self._n + 1)
+        self._x[self._n] = x
+        self._y[self._n] = y
+        self._n += 1
+        
+        self._sum_y += y
+        self._sum_xy += x * y
+        
+        # Trapezoidal rule is a sum of edge areas, so AUC grows by one edge per point
+        if self._prev_x is not None:
+            self._auc += 0.5 * (y + self._prev_y) * (x - self._prev_x)
+        self._prev_x = x
+        self._prev_y = y
+        
+        # Strict comparison keeps the first maximum, matching np.argmax. A plain
+        # branch is cheaper in CPython than tuple-indexed "branchless" updates.
+        if y > self._max_y:
+            self._max_y = y
+            self._peak_x = x
+            self._peak_idx = self._n - 1
+        if y < self._min_y:
+            self._min_y = y
+            self._dip_idx = self._n - 1
+        
+        # Noise statistics (Welford) over samples below 10% of the running max.
+        # A large jump in the max moves the threshold, so rebuild them lazily.
+        if self._max_y > self._noise_ref_max * 1.1:
+            self._noise_stale = True
+        elif not self._noise_stale and y < self._max_y * 0.1:
+            self._noise_n += 1
+            delta = y - self._noise_mean
+            self._noise_mean += delta / self._noise_n
+            self._noise_M2 += delta * (y - self._noise_mean)
+    
+    def _reset_running_state(self):
+        """Reset the incremental metric state (buffers are kept for reuse)"""
+        self._n = 0
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        self._auc = 0.0
+        self._prev_x = None
+        self._prev_y = None
+        self._max_y = -np.inf
+        self._peak_x = 0.0
+        self._peak_idx = 0
+        self._min_y = np.inf
+        self._dip_idx = 0
+        self._noise_n = 0
+        self._noise_mean = 0.0
+        self._noise_M2 = 0.0
+        self._noise_ref_max = -np.inf
+        self._noise_stale = False
+        self._state_valid = True
+        self._points_cache = None
     
     def clear_data(self):
         """Clear all data points and reset metrics"""
-        self.data_points = []
+        self._reset_running_state()
         self.reset_metrics()
-        self.metrics_updated.emit(self.metrics.copy())
+        self.metrics_updated.emit(self.metrics)
     
     def get_data_points(self):
-        """Get current data points"""
-        return self.data_points.copy()
+        """Get current data points as a read-only (n, 2) array.
+        
+        The array is shared between calls until new data arrives; use
+        get_data_points_copy() for a writable copy.
+        """
+        if self._points_cache is None or len(self._points_cache) != self._n:
+            self._points_cache = self.get_data_points_copy()
+            self._points_cache.flags.writeable = False
+        return self._points_cache
+    
+    def get_data_points_copy(self):
+        """Get a writable (n, 2) copy of the current data points"""
+        return np.column_stack((self._x[:self._n], self._y[:self._n]))
     
     def get_plot_data(self):
-        """Get data formatted for plotting"""
-        if not self.data_points:
-            return [], []
-        return zip(*self.data_points)
+        """Get data formatted for plotting (views into the buffers, no copy)"""
+        return self._x[:self._n], self._y[:self._n]
     
     def calculate_metrics(self):
         """Calculate all metrics based on current data"""
-        if not self.data_points:
+        if not self._n:
             self.reset_metrics()
             return
-            
-        # Extract wavelengths and intensities
-        wavelengths, intensities = zip(*self.data_points)
-        intensities = np.array(intensities)
-        wavelengths = np.array(wavelengths)
-        
-        # Calculate peak value and max intensity
-        max_intensity = np.max(intensities)
-        peak_idx = np.argmax(intensities)
-        peak_value = wavelengths[peak_idx]
-        
-        # Calculate centroid
-        if np.sum(intensities) > 0:
-            centroid = np.sum(wavelengths * intensities) / np.sum(intensities)
+        
+        if not self._state_valid:
+            self._rebuild_running_state()
+        
+        wavelengths = self._x[:self._n]
+        intensities = self._y[:self._n]
+        
+        # Peak, max intensity and centroid come straight from the running state
+        max_intensity = self._max_y
+        peak_value = self._peak_x
+        
+        if self._sum_y > 0:
+            centroid = self._sum_xy / self._sum_y
         else:
             centroid = 0
         
-        # Calculate FWHM
-        half_max = max_intensity / 2
-        above_half = intensities > half_max
-        
-        if np.any(above_half):
-            left_idx = np.argmax(above_half)
-            right_idx = len(above_half) - np.argmax(above_half[::-1]) - 1
-            if right_idx > left_idx:
-                fwhm = wavelengths[right_idx] - wavelengths[left_idx]
-            else:
-                fwhm = 0
+        # Calculate FWHM around the peak (or dip for absorption spectra)
+        if self.emission:
+            fwhm = self._calculate_fwhm(wavelengths, intensities, self._peak_idx,
+                                        max_intensity / 2, 1)
         else:
-            fwhm = 0
+            fwhm = self._calculate_fwhm(wavelengths, intensities, self._dip_idx,
+                                        (max_intensity + self._min_y) / 2, -1)
         
-        # Calculate AUC (Area Under Curve)
-        if len(wavelengths) > 1:
-            auc = np.trapezoid(intensities, wavelengths)
-        else:
-            auc = 0
+        # AUC (Area Under Curve) is accumulated as points arrive
+        auc = self._auc
         
         # Calculate SNR (simple version)
-        noise_region = intensities < (max_intensity * 0.1)
-        if np.any(noise_region) and len(intensities[noise_region]) > 1:
-            noise_std = np.std(intensities[noise_region])
+        if self._noise_stale:
+            self._rebuild_noise_stats(intensities)
+        if self._noise_n > 1:
+            noise_std = np.sqrt(self._noise_M2 / self._noise_n)
             snr = max_intensity / noise_std if noise_std > 0 else 0
         else:
             snr = 0
         
-        # Update metrics dictionary
-        self.metrics = {
-            'peak_value': float(peak_value),
-            'centroid': float(centroid),
-            'max_intensity': float(max_intensity),
-            'fwhm': float(fwhm),
-            'snr': float(snr),
-            'auc': float(auc)
-        }
+        self.metrics = Metrics(
+            peak_value=float(peak_value),
+            centroid=float(centroid),
+            max_intensity=float(max_intensity),
+            fwhm=float(fwhm),
+            snr=float(snr),
+            auc=float(auc)
+        )
+    
+    def _rebuild_noise_stats(self, intensities):
+        """Recompute the noise statistics against the current 10% threshold"""
+        noise = intensities[intensities < self._max_y * 0.1]
+        self._noise_n = len(noise)
+        self._noise_mean = float(noise.mean()) if self._noise_n else 0.0
+        self._noise_M2 = float(((noise - self._noise_mean) ** 2).sum())
+        self._noise_ref_max = self._max_y
+        self._noise_stale = False
+    
+    @staticmethod
+    def _calculate_fwhm(wavelengths, intensities, idx, level, sign):
+        """Width of the feature at idx where sign * intensity stays above sign * level.
+        
+        Walks outwards from idx to the first samples on or beyond the level and
+        interpolates the crossings linearly, so only the bins inside the feature
+        are visited. Wavelengths are assumed to be monotone, as during a scan.
+        """
+        n = len(intensities)
+        if sign * intensities[idx] <= sign * level:
+            return 0
+        
+        left = idx
+        while left > 0 and sign * intensities[left - 1] > sign * level:
+            left -= 1
+        if left > 0:
+            x_l = _interpolate_crossing(wavelengths, intensities, left - 1, left, level)
+        else:
+            x_l = wavelengths[0]
+        
+        right = idx
+        while right < n - 1 and sign * intensities[right + 1] > sign * level:
+            right += 1
+        if right < n - 1:
+            x_r = _interpolate_crossing(wavelengths, intensities, right, right + 1, level)
+        else:
+            x_r = wavelengths[n - 1]
+        
+        return abs(x_r - x_l)
     
     def reset_metrics(self):
         """Reset all metrics to zero"""
-        self.metrics = {
-            'peak_value': 0,
-            'centroid': 0,
-            'max_intensity': 0,
-            'fwhm': 0,
-            'snr': 0,
-            'auc': 0
-        }
+        self.metrics = Metrics()
     
     def export_to_csv(self, parent_widget=None):
         """Export data points to CSV file"""
-        if not self.data_points:
+        from PyQt5.QtWidgets import QMessageBox, QFileDialog
+        
+        if not self._n:
             if parent_widget:
                 QMessageBox.warning(parent_widget, "No Data", "No data to save.")
             return False
@@ -136,10 +420,12 @@ class DataProcessor(QObject):
         if filename:
             try:
                 with open(filename, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["Wavelength", "Intensity"])
-                    for point in self.data_points:
-                        writer.writerow(point)
+                    csvfile.write("Wavelength,Intensity\n")
+                    # Write in chunks so huge scans don't need a full (n, 2) copy
+                    for start in range(0, self._n, _CSV_CHUNK_ROWS):
+                        stop = min(start + _CSV_CHUNK_ROWS, self._n)
+                        rows = np.column_stack((self._x[start:stop], self._y[start:stop]))
+                        np.savetxt(csvfile, rows, delimiter=',', fmt='%.10g')
                 
                 if parent_widget:
                     QMessageBox.information(parent_widget, "Success", f"Data saved to {filename}")
@@ -154,6 +440,10 @@ class DataProcessor(QObject):
     
     def export_plot_as_png(self, plot_widget, parent_widget=None):
         """Export plot as PNG image"""
+        import pyqtgraph as pg
+        import pyqtgraph.exporters
+        from PyQt5.QtWidgets import QMessageBox, QFileDialog
+        
         options = QFileDialog.Options()
         filename, _ = QFileDialog.getSaveFileName(
             parent_widget, 
@@ -165,8 +455,14 @@ class DataProcessor(QObject):
         
         if filename:
             try:
-                exporter = pg.exporters.ImageExporter(plot_widget.plotItem)
+                plot_item = plot_widget.plotItem
+                # Reuse the exporter for this plot; the identity check guards against id reuse
+                exporter = self._exporter_cache.get(id(plot_item))
+                if exporter is None or exporter.item is not plot_item:
+                    exporter = pg.exporters.ImageExporter(plot_item)
+                    self._exporter_cache[id(plot_item)] = exporter
                 exporter.parameters()['width'] = 800
+                exporter.widthChanged()  # Match the height to the plot's current aspect ratio
                 exporter.export(filename)
                 
                 if parent_widget:
@@ -181,12 +477,13 @@ class DataProcessor(QObject):
         return False
     
     def get_metrics_text(self):
-        """Get formatted text for all metrics"""
-        return {
-            'peak_value': f"Peak Value is {self.metrics['peak_value']:.2f} nm",
-            'centroid': f"Centroid is {self.metrics['centroid']:.2f} nm",
-            'max_intensity': f"Maximum Intensity is {self.metrics['max_intensity']:.0f}",
-            'fwhm': f"FWHM is {self.metrics['fwhm']:.2f} nm",
-            'snr': f"SNR is {self.metrics['snr']:.1f}",
-            'auc': f"AUC is {self.metrics['auc']:.0f}"
-        }
+        """Get formatted text for all metrics (shared between calls, do not modify)"""
+        m = self.metrics
+        return _format_metrics(
+            round(m.peak_value, 2),
+            round(m.centroid, 2),
+            round(m.max_intensity),
+            round(m.fwhm, 2),
+            round(m.snr, 1),
+            round(m.auc)
+        )
@@ -7,6 +7,49 @@ from ModernSpectro import Ui_Form
 from serial_handler import SerialHandler
 from data_processor import DataProcessor
 
+_STYLE_CONNECTED = (
+    "background-color: #07072b; "
+    "color: white; "
+    "border-radius: 30px; "
+    "padding: 2px 10px; "
+    "font-weight: bold; "
+    "font-size: 16px; "
+    "text-align: center; "
+    "border: 1px solid #1d990f;"
+)
+
+_STYLE_DISCONNECTED = (
+    "background-color: #07072b; "
+    "color: white; "
+    "border-radius: 30px; "
+    "padding: 2px 10px; "
+    "font-weight: bold; "
+    "text-align: center; "
+    "font-size: 18px; "
+    "border: 1px solid #cf1111;"
+)
+
+_BTN_DISCONNECT = (
+    "background-color: #f00e0e; "
+    "color: black; "
+    "border-radius: 15px; "
+    "border: 1px solid #cf1111;"
+)
+
+_BTN_CONNECT = (
+    "QPushButton {"
+        "background-color: #4c8c0b;"
+        "color:black;"
+        "border: 1px solid #3c3c5c;"
+        "border-radius: 15px;"
+        "padding: 6px 12px;"
+    "}"
+    "QPushButton:hover {"
+        "background-color: #234203;"
+        "color: white;"
+    "}"
+)
+
 
 class MainApp(QWidget):
     """Main application class that coordinates GUI, serial communication, and data processing"""
@@ -18,8 +61,15 @@ class MainApp(QWidget):
         self.serial_handler = SerialHandler()
         self.data_processor = DataProcessor()
         self.plot_curve = None
+        self._plotted_count = 0
         self.zoom_mode = False
         self.original_view = None
+        self._dirty = False
+        self._last_label_text = {}
+        self._connection_state = None
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._flush_updates)
         self.setup_ui()
         self.setup_connections()
         self.setup_plot_widget()
@@ -42,7 +92,7 @@ class MainApp(QWidget):
         self.ui.exportPNG.clicked.connect(self.export_graph_as_png)
         self.ui.exportSS.clicked.connect(self.export_screenshot)
         self.ui.zoomBtn.clicked.connect(self.toggle_zoom)
-        self.serial_handler.data_received.connect(self.on_data_received)
+        self.serial_handler.data_batch_received.connect(self.on_data_received)
         self.serial_handler.connection_status_changed.connect(self.on_connection_status_changed)
         self.serial_handler.error_occurred.connect(self.on_error_occurred)
         self.data_processor.metrics_updated.connect(self.on_metrics_updated)
@@ -55,6 +105,9 @@ class MainApp(QWidget):
         self.ui.plotWidget.getAxis('bottom').setPen(pg.mkPen(color='#ffffff'))
         self.ui.plotWidget.setLabel('left', "Intensity")
         self.ui.plotWidget.setLabel('bottom', "Wavelength (nm)")
+        # Render at most a few samples per pixel and skip points outside the view
+        self.ui.plotWidget.setDownsampling(auto=True, mode='peak')
+        self.ui.plotWidget.setClipToView(True)
     
     def populate_com_ports(self):
         """Populate COM port dropdown with available ports"""
@@ -110,13 +163,16 @@ class MainApp(QWidget):
                 symbol='o', 
                 symbolSize=5, 
                 symbolBrush='#1f77b4',
-                symbolPen='w'
+                symbolPen='w',
+                skipFiniteCheck=True
             )
         else:
             self.plot_curve = self.ui.plotWidget.plot(
                 [], [], 
-                pen=pg.mkPen(color='#1f77b4', width=2)
+                pen=pg.mkPen(color='#1f77b4', width=2),
+                skipFiniteCheck=True
             )
+        self._plotted_count = 0
     
     def update_plot(self):
         """Update the plot with current data"""
@@ -124,11 +180,15 @@ class MainApp(QWidget):
             self.create_plot_curve()
         
         x_vals, y_vals = self.data_processor.get_plot_data()
-        if x_vals and y_vals:
-            self.plot_curve.setData(x_vals, y_vals)
+        # Data is append-only, so an unchanged length means nothing to redraw
+        if len(x_vals) and len(x_vals) != self._plotted_count:
+            self.plot_curve.setData(x=x_vals, y=y_vals)
+            self._plotted_count = len(x_vals)
     
     def clear_graph(self):
         """Clear graph and all data"""
+        self._refresh_timer.stop()
+        self._dirty = False
         self.data_processor.clear_data()
         if self.plot_curve:
             self.ui.plotWidget.removeItem(self.plot_curve)
@@ -195,68 +255,55 @@ class MainApp(QWidget):
     
     def update_connection_status(self, connected, port=None, baud=None):
         """Update connection status display"""
-        if connected and port and baud:
+        connected = bool(connected and port and baud)
+        # Restyling forces Qt to reparse the stylesheets, so only do it on a real change
+        state = (connected, port, baud) if connected else (False, None, None)
+        if state == self._connection_state:
+            return
+        self._connection_state = state
+        
+        if connected:
             self.ui.ConStatus.setText(f"Connected {port} @ {baud}")
-            self.ui.ConStatus.setStyleSheet(
-                "background-color: #07072b; "
-                "color: white; "
-                "border-radius: 30px; "
-                "padding: 2px 10px; "
-                "font-weight: bold; "
-                "font-size: 16px; "
-                "text-align: center; "
-                "border: 1px solid #1d990f;"
-            )
-            
+            self.ui.ConStatus.setStyleSheet(_STYLE_CONNECTED)
             self.ui.connectBtn.setText("Disconnect")
-            self.ui.connectBtn.setStyleSheet(
-                "background-color: #f00e0e; "
-                "color: black; "
-                "border-radius: 15px; "
-                "border: 1px solid #cf1111;"
-            )
+            self.ui.connectBtn.setStyleSheet(_BTN_DISCONNECT)
         else:
             self.ui.ConStatus.setText("Disconnected the Board")
-            self.ui.ConStatus.setStyleSheet(
-                "background-color: #07072b; "
-                "color: white; "
-                "border-radius: 30px; "
-                "padding: 2px 10px; "
-                "font-weight: bold; "
-                "text-align: center; "
-                "font-size: 18px; "
-                "border: 1px solid #cf1111;"
-            )
-            
+            self.ui.ConStatus.setStyleSheet(_STYLE_DISCONNECTED)
             self.ui.connectBtn.setText("Connect")
-            self.ui.connectBtn.setStyleSheet(
-                "QPushButton {"
-                    "background-color: #4c8c0b;"
-                    "color:black;"
-                    "border: 1px solid #3c3c5c;"
-                    "border-radius: 15px;"
-                    "padding: 6px 12px;"
-                "}"
-                "QPushButton:hover {"
-                    "background-color: #234203;"
-                    "color: white;"
-                "}"
-            )
+            self.ui.connectBtn.setStyleSheet(_BTN_CONNECT)
     
     def update_all_metric_labels(self):
         """Update all metric display labels"""
         metrics_text = self.data_processor.get_metrics_text()
-        self.ui.peadValue.setText(metrics_text['peak_value'])
-        self.ui.centroid.setText(metrics_text['centroid'])
-        self.ui.maxIntensity.setText(metrics_text['max_intensity'])
-        self.ui.fwhm.setText(metrics_text['fwhm'])
-        self.ui.snr.setText(metrics_text['snr'])
-        self.ui.auc.setText(metrics_text['auc'])
+        labels = {
+            'peak_value': self.ui.peadValue,
+            'centroid': self.ui.centroid,
+            'max_intensity': self.ui.maxIntensity,
+            'fwhm': self.ui.fwhm,
+            'snr': self.ui.snr,
+            'auc': self.ui.auc
+        }
+        # Skip setText (and the repaint it triggers) for labels that did not change
+        for key, label in labels.items():
+            text = metrics_text[key]
+            if self._last_label_text.get(key) != text:
+                label.setText(text)
+                self._last_label_text[key] = text
+    
+    def on_data_received(self, xs, ys):
+        """Handle a batch of new data received from serial"""
+        self.data_processor.add_data_points_batch(xs, ys)
+        if not self._dirty:
+            self._dirty = True
+            self._refresh_timer.start(33)  # Coalesce redraws to ~30 Hz
     
-    def on_data_received(self, x, y):
-        """Handle new data received from serial"""
-        self.data_processor.add_data_point(x, y)
+    def _flush_updates(self):
+        """Refresh metrics, plot and labels for all samples received since the last refresh"""
+        self._dirty = False
+        self.data_processor.calculate_metrics()
         self.update_plot()
+        self.update_all_metric_labels()
     
     def on_connection_status_changed(self, connected, port, baud):
         """Handle connection status changes"""
@@ -266,6 +313,11 @@ class MainApp(QWidget):
         """Handle errors from serial handler"""
         QMessageBox.critical(self, "Error", error_message)
     
+    def closeEvent(self, event):
+        """Stop the serial reader thread before the window goes away"""
+        self.serial_handler.disconnect()
+        super().closeEvent(event)
+    
     def on_metrics_updated(self, metrics):
         """Handle metrics updates from data processor"""
         self.update_all_metric_labels()
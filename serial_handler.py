@@ -1,19 +1,60 @@
+import logging
+import re
+import numpy as np
 import serial
 import serial.tools.list_ports
-from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# One data line per match: d#<wavelength>#<intensity>
+_LINE_RE = re.compile(rb'^d#(-?\d+)#(-?\d+)[ \t\r]*$', re.MULTILINE)
+
+
+class SerialReaderThread(QThread):
+    """Blocks on the serial port and forwards raw bytes as soon as a line arrives"""
+    raw_data = pyqtSignal(bytes)
+    read_failed = pyqtSignal(str)
+    
+    def __init__(self, serial_port):
+        super().__init__()
+        self.serial_port = serial_port
+        self._running = True
+    
+    def stop(self):
+        """Ask the thread to finish and wake up a pending read"""
+        self._running = False
+        if hasattr(self.serial_port, 'cancel_read'):
+            self.serial_port.cancel_read()
+    
+    def run(self):
+        while self._running:
+            try:
+                # Returns after a full line or the port timeout, whichever comes first
+                data = self.serial_port.read_until(b'\n')
+                waiting = self.serial_port.in_waiting
+                if waiting:
+                    data += self.serial_port.read(waiting)
+            except Exception as e:
+                if self._running:
+                    self.read_failed.emit(str(e))
+                return
+            
+            if data and self._running:
+                self.raw_data.emit(data)
 
 
 class SerialHandler(QObject):
     """Handles all serial communication functionality"""
-    data_received = pyqtSignal(int, int)
+    data_batch_received = pyqtSignal(object, object)  # Wavelength and intensity arrays
     connection_status_changed = pyqtSignal(bool, str, str)
     error_occurred = pyqtSignal(str)
     
     def __init__(self):
         super().__init__()
         self.serial_port = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self._read_serial_data)
+        self._rx_buf = bytearray()
+        self._reader = None
         self.scan_active = False
         
     def get_available_ports(self):
@@ -59,8 +100,12 @@ class SerialHandler(QObject):
             
         try:
             self.serial_port.write(b'd#101#1002\n')
+            self._rx_buf.clear()
             self.scan_active = True
-            self.timer.start(100)  # Read every 100ms
+            self._reader = SerialReaderThread(self.serial_port)
+            self._reader.raw_data.connect(self._on_raw_data)
+            self._reader.read_failed.connect(self._on_read_failed)
+            self._reader.start()
             return True
         except Exception as e:
             self.error_occurred.emit(f"Failed to start scan: {str(e)}")
@@ -72,31 +117,58 @@ class SerialHandler(QObject):
             return
             
         try:
+            self.scan_active = False
+            self._stop_reader()
             if self.is_connected():
                 self.serial_port.write(b'STOP\n')
-            self.timer.stop()
-            self.scan_active = False
         except Exception as e:
             self.error_occurred.emit(f"Error stopping scan: {str(e)}")
     
-    def _read_serial_data(self):
-        """Internal method to read data from serial port"""
-        if not self.is_connected() or not self.scan_active:
-            self.timer.stop()
+    def _stop_reader(self):
+        """Stop the reader thread and wait for it to exit"""
+        if self._reader is None:
+            return
+        self._reader.stop()
+        self._reader.wait()
+        self._reader.deleteLater()
+        self._reader = None
+    
+    def _on_raw_data(self, data):
+        """Internal slot that parses bytes forwarded by the reader thread"""
+        if not self.scan_active:
             return
         
         try:
-            if self.serial_port.in_waiting:
-                line = self.serial_port.readline().decode(errors='ignore').strip()
-                print("Received:", line)
-                
-                if line.startswith("d#"):
-                    parts = line.split("#")
-                    if len(parts) == 3:
-                        x = int(parts[1])
-                        y = int(parts[2])
-                        self.data_received.emit(x, y)
-                        
+            # Keep a trailing partial line for the next chunk
+            self._rx_buf += data
+            end = self._rx_buf.rfind(b'\n')
+            if end < 0:
+                return
+            block = bytes(self._rx_buf[:end])
+            del self._rx_buf[:end + 1]
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                for line in block.split(b'\n'):
+                    logger.debug("Received: %s", line.decode(errors='ignore').strip())
+            
+            xs, ys = self._parse_block(block)
+            if len(xs):
+                self.data_batch_received.emit(xs, ys)
+                    
         except Exception as e:
             self.error_occurred.emit(f"Error reading serial data: {str(e)}")
             self.stop_scan()
+    
+    def _on_read_failed(self, message):
+        """Internal slot for read errors raised in the reader thread"""
+        self.error_occurred.emit(f"Error reading serial data: {message}")
+        self.stop_scan()
+    
+    @staticmethod
+    def _parse_block(block):
+        """Parse newline-separated 'd#<x>#<y>' lines into wavelength and intensity arrays"""
+        fields = _LINE_RE.findall(block)
+        if not fields:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        data = np.array(fields).astype(np.int64)
+        return data[:, 0], data[:, 1]